@@ -2,7 +2,9 @@ import streamlit as st
 import openai
 from streamlit_mic_recorder import mic_recorder
 from io import BytesIO
-import base64
+from collections import OrderedDict
+import os
+import threading
 
 # --- 1. Page Configuration ---
 st.set_page_config(
@@ -13,83 +15,160 @@ st.set_page_config(
 )
 
 # --- 2. Helper Functions ---
-def get_base64_image(image_path):
-    """Encodes a local image to base64 for embedding in HTML."""
-    try:
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
-    except FileNotFoundError:
+SYSTEM_PROMPT = (
+    "You are a hyper-efficient translation engine. Your sole function is to "
+    "detect if the user's input is English or French and provide the translation in the other language. "
+    "Output ONLY the translated text and nothing else. Do not explain, do not greet."
+)
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+HISTORY_LIMIT = 50  # messages shown in the chat history
+TRANSLATION_CACHE_SIZE = 10_000  # translations kept in the server-wide LRU
+LONG_TEXT_CHARS = 500  # inputs at least this long are translated with gpt-4o instead of gpt-4o-mini
+
+def show_icon(column, image_path, placeholder):
+    """Shows a local icon in a column, falling back to an emoji if the file is missing."""
+    if os.path.exists(image_path):
+        column.image(image_path, width=40)
+    else:
         st.warning(f"Image file not found at {image_path}. Using placeholders.")
-        return None
+        column.markdown(f"<h1 style='margin: 0;'>{placeholder}</h1>", unsafe_allow_html=True)
+
+@st.cache_resource
+def get_openai_client():
+    """Creates one OpenAI client so its connection pool is shared across reruns and sessions."""
+    return openai.OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+
+@st.cache_resource
+def get_translation_cache():
+    """Holds completed translations keyed on their input text, shared by every session, with its lock."""
+    return OrderedDict(), threading.Lock()
 
 def translate_text(text_to_translate):
-    """Calls OpenAI API to translate text between English and French."""
-    system_prompt = (
-        "You are a hyper-efficient translation engine. Your sole function is to "
-        "detect if the user's input is English or French and provide the translation in the other language. "
-        "Output ONLY the translated text and nothing else. Do not explain, do not greet."
-    )
+    """Streams the OpenAI translation between English and French chunk by chunk.
+
+    API errors propagate to the caller so a partial translation is never used.
+    """
+    translation_cache, cache_lock = get_translation_cache()
+    with cache_lock:
+        cached = translation_cache.get(text_to_translate)
+        if cached is not None:
+            translation_cache.move_to_end(text_to_translate)
+    if cached is not None:
+        yield cached
+        return
+
+    # Translation is stateless: send only the current text, never the chat history
     messages = [
-        {"role": "system", "content": system_prompt},
+        SYSTEM_MESSAGE,
         {"role": "user", "content": text_to_translate}
     ]
+    stream = CHAT_CREATE(
+        model="gpt-4o-mini" if len(text_to_translate) < LONG_TEXT_CHARS else "gpt-4o",
+        messages=messages,
+        # Translations stay close to the input length; the cap only trims runaway outputs
+        max_tokens=max(64, len(text_to_translate.split()) * 3),
+        temperature=0,
+        response_format={"type": "text"},
+        stream=True,
+    )
+    pieces = []
+    finish_reason = None
+    for chunk in stream:
+        if chunk.choices:
+            piece = chunk.choices[0].delta.content or ""
+            pieces.append(piece)
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            yield piece
+    # Never cache a reply cut off by max_tokens
+    if finish_reason == "length":
+        return
+    with cache_lock:
+        translation_cache[text_to_translate] = "".join(pieces)
+        if len(translation_cache) > TRANSLATION_CACHE_SIZE:
+            translation_cache.popitem(last=False)
+
+def stream_translation(text_to_translate):
+    """Streams a translation into the page and returns it, or None if the API call fails."""
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-        )
-        return response.choices[0].message.content
+        return st.write_stream(translate_text(text_to_translate))
     except Exception as e:
         st.error(f"An error occurred with the OpenAI API: {e}", icon="🔥")
         return None
 
-def speak_text(text):
+@st.cache_data(show_spinner=False)
+def transcribe_bytes(audio_bytes, filename="audio.wav"):
+    """Transcribes audio with Whisper, cached on the audio content."""
+    audio_bio = BytesIO(audio_bytes)
+    audio_bio.name = filename
+    transcription_response = TRANSCRIBE(
+        model="whisper-1",
+        file=audio_bio
+    )
+    return transcription_response.text
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def synthesize_speech(text, voice="alloy", model="gpt-4o-mini-tts"):
+    """Calls OpenAI TTS and returns the MP3 bytes, cached on text, voice and model."""
+    response = TTS_CREATE(
+        model=model,
+        voice=voice,
+        input=text
+    )
+    return response.read()
+
+def speak_text(text, voice="alloy", model="gpt-4o-mini-tts"):
     """Convert text to speech using OpenAI TTS and return audio bytes."""
     try:
-        response = openai.audio.speech.create(
-            model="gpt-4o-mini-tts",
-            voice="alloy",   # you can change to other available voices
-            input=text
-        )
-        audio_bytes = response.read()
-        return audio_bytes
+        return synthesize_speech(text, voice, model)
     except Exception as e:
         st.error(f"TTS error: {e}", icon="🔊")
         return None
 
+def render_message(message):
+    """Renders a single chat message."""
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"])
+
+def render_history():
+    """Renders the most recent chat messages."""
+    for message in st.session_state.messages[-HISTORY_LIMIT:]:
+        render_message(message)
+
+def add_to_history(container, message):
+    """Appends a message to the chat history and draws it into the history container, avoiding a full rerun."""
+    st.session_state.messages.append(message)
+    with container:
+        render_message(message)
+
 # --- 3. Setup and Initialization ---
-uk_icon_b64 = get_base64_image("assets/UK_icon.png")
-fr_icon_b64 = get_base64_image("assets/FR_icon.png")
-
-uk_icon_html = f'<img src="data:image/png;base64,{uk_icon_b64}" width="40">' if uk_icon_b64 else "🇬🇧"
-fr_icon_html = f'<img src="data:image/png;base64,{fr_icon_b64}" width="40">' if fr_icon_b64 else "🇫🇷"
-
-st.markdown(
-    f"""
-    <div style="display: flex; align-items: center; justify-content: space-between;">
-        {uk_icon_html}
-        <h1 style="margin: 0; text-align: center; flex-grow: 1;">English ⇄ French</h1>
-        {fr_icon_html}
-    </div>
-    """,
+uk_col, title_col, fr_col = st.columns([1, 6, 1], vertical_alignment="center")
+show_icon(uk_col, "assets/UK_icon.png", "🇬🇧")
+title_col.markdown(
+    "<h1 style='margin: 0; text-align: center;'>English ⇄ French</h1>",
     unsafe_allow_html=True
 )
+show_icon(fr_col, "assets/FR_icon.png", "🇫🇷")
 
 # OpenAI API Key Setup
 try:
-    openai.api_key = st.secrets["OPENAI_API_KEY"]
+    client = get_openai_client()
 except (KeyError, FileNotFoundError):
     st.error("OpenAI API key not found. Please add it to your Streamlit secrets.", icon="🚨")
     st.stop()
 
+# Bind the API methods used on the hot path once per run
+CHAT_CREATE = client.chat.completions.create
+TRANSCRIBE = client.audio.transcriptions.create
+TTS_CREATE = client.audio.speech.create
+
 # Session State Initialization
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
 # --- 4. Display Chat History ---
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+history_area = st.container()
+with history_area:
+    render_history()
 
 # --- 5. UI Tabs for Input ---
 if "active_tab" not in st.session_state:
@@ -106,17 +185,17 @@ tab_map = dict(zip(tab_labels, tabs))
 with tab_map["💬 Chat"]:
     if prompt := st.chat_input("Enter text to translate..."):
         st.session_state.active_tab = "💬 Chat"
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        with st.chat_message("user"):
-            st.markdown(prompt)
+        messages = st.session_state.messages
+        user_message = {"role": "user", "content": prompt}
+        messages.append(user_message)
+        render_message(user_message)
 
         with st.chat_message("assistant"):
             with st.spinner("Translating..."):
-                translation = translate_text(prompt)
+                translation = stream_translation(prompt)
                 if translation:
-                    st.session_state.messages.append({"role": "assistant", "content": translation})
-                    st.markdown(translation)
-                    # Speak translation
+                    messages.append({"role": "assistant", "content": translation})
+                    # Speak translation; TTS needs the complete text, so it follows the stream
                     audio_bytes = speak_text(translation)
                     if audio_bytes:
                         st.audio(audio_bytes, format="audio/mp3")
@@ -129,24 +208,18 @@ with tab_map["📁 File Uploader"]:
         st.audio(audio_file)
         with st.spinner("Transcribing audio..."):
             try:
-                audio_file.name = "uploaded_audio.wav"
-                transcription_response = openai.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file
-                )
-                transcribed_text = transcription_response.text
+                transcribed_text = transcribe_bytes(audio_file.getvalue(), "uploaded_audio.wav")
                 st.success(f"**Transcription:** {transcribed_text}")
-                st.session_state.messages.append({"role": "user", "content": f"🎤 *Transcription:* {transcribed_text}"})
+                add_to_history(history_area, {"role": "user", "content": f"🎤 *Transcription:* {transcribed_text}"})
 
                 with st.spinner("Translating text..."):
-                    translation = translate_text(transcribed_text)
+                    st.markdown("**Translation:**")
+                    translation = stream_translation(transcribed_text)
                     if translation:
-                        st.info(f"**Translation:** {translation}")
-                        st.session_state.messages.append({"role": "assistant", "content": translation})
+                        add_to_history(history_area, {"role": "assistant", "content": translation})
                         audio_bytes = speak_text(translation)
                         if audio_bytes:
                             st.audio(audio_bytes, format="audio/mp3")
-                        #st.rerun()
             except Exception as e:
                 st.error(f"An error occurred during transcription: {e}", icon="🔥")
 
@@ -156,28 +229,21 @@ with tab_map["🎙️ Audio Recorder"]:
     if audio_info and audio_info['bytes']:
         st.session_state.active_tab = "🎙️ Audio Recorder"
         st.audio(audio_info['bytes'], format='audio/wav')
-        audio_bio = BytesIO(audio_info['bytes'])
-        audio_bio.name = 'recorded_audio.wav'
 
         with st.spinner("Transcribing audio..."):
             try:
-                transcription_response = openai.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_bio
-                )
-                transcribed_text = transcription_response.text
+                transcribed_text = transcribe_bytes(audio_info['bytes'], "recorded_audio.wav")
                 st.success(f"**Transcription:** {transcribed_text}")
-                st.session_state.messages.append({"role": "user", "content": f"🎤 *Transcription:* {transcribed_text}"})
+                add_to_history(history_area, {"role": "user", "content": f"🎤 *Transcription:* {transcribed_text}"})
 
                 with st.spinner("Translating text..."):
-                    translation = translate_text(transcribed_text)
+                    st.markdown("**Translation:**")
+                    translation = stream_translation(transcribed_text)
                     if translation:
-                        st.info(f"**Translation:** {translation}")
-                        st.session_state.messages.append({"role": "assistant", "content": translation})
+                        add_to_history(history_area, {"role": "assistant", "content": translation})
                         audio_bytes = speak_text(translation)
                         if audio_bytes:
                             st.audio(audio_bytes, format="audio/mp3")
-                        #st.rerun()
             except Exception as e:
                 st.error(f"An error occurred during transcription: {e}", icon="🔥")
 